@@ -1,19 +1,30 @@
 """SQLite database helper for the marketing platform.
 
 This module wraps the built‑in ``sqlite3`` library with a few
-convenience functions for executing queries and returning results
-as dictionaries.  It also exposes a function to initialise the
-schema on startup.
+convenience functions for executing queries and returning results:
+``fetchall`` returns ``sqlite3.Row`` objects and ``fetchone`` a single
+dictionary.  It also exposes a function to initialise the schema on
+startup.
+
+Connections are cached per thread rather than opened for every
+query: ``sqlite3`` connections must not be shared across threads, so
+each worker thread lazily opens its own connection the first time it
+touches the database and keeps it for the lifetime of the process.
 """
 
 from __future__ import annotations
 
+import atexit
+import logging
 import os
 import sqlite3
-from contextlib import contextmanager
+import threading
+import weakref
 from typing import Any, Dict, Iterable, List, Optional
 
 
+logger = logging.getLogger(__name__)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.environ.get(
     "DATABASE_PATH", os.path.join(BASE_DIR, "database.db")
@@ -91,42 +102,187 @@ def init_db() -> None:
             )
             """
         )
+        conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS idx_customers_industry ON customers(industry);
+            CREATE INDEX IF NOT EXISTS idx_customers_region ON customers(region);
+            CREATE INDEX IF NOT EXISTS idx_customers_add_status ON customers(add_status);
+            CREATE INDEX IF NOT EXISTS idx_customers_unadded ON customers(industry)
+                WHERE add_status != '已添加';
+            CREATE INDEX IF NOT EXISTS idx_message_logs_customer_id ON message_logs(customer_id);
+            """
+        )
+        has_phone_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_customers_phone'"
+        ).fetchone()
+        if not has_phone_index:
+            _prepare_phone_index(conn)
+        conn.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone)
+            WHERE phone IS NOT NULL AND phone != ''
+            """
+        )
+        # Gather planner statistics the first time round; afterwards let
+        # SQLite decide whether they are stale enough to refresh.
+        analyzed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()
+        conn.execute("PRAGMA optimize" if analyzed else "ANALYZE")
         conn.commit()
 
 
-@contextmanager
-def get_conn() -> Iterable[sqlite3.Connection]:
-    """Context manager yielding a SQLite connection with row dicts.
+def _prepare_phone_index(conn: sqlite3.Connection) -> None:
+    """Clear the way for ``idx_customers_phone`` on an older database.
 
-    The connection is configured so that ``cursor.fetchall()`` returns
-    rows as dictionaries rather than tuples.  The connection is
-    automatically closed when the context exits.
+    Databases created before the unique phone index may hold duplicate
+    phone numbers.  Only redundant generated customers (channel
+    ``自动生成`` with no message logs) are removed, always keeping one row
+    per phone.  Manually entered customers and anything with message
+    history are never touched: if duplicates remain, startup is refused
+    with their ids so an operator can resolve them, and the enclosing
+    transaction rolls back the cleanup.
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
+    removed = conn.execute(
+        """
+        DELETE FROM customers
+        WHERE channel = '自动生成' AND phone IS NOT NULL AND phone != ''
+          AND NOT EXISTS (SELECT 1 FROM message_logs m WHERE m.customer_id = customers.id)
+          AND EXISTS (
+              SELECT 1 FROM customers o
+              WHERE o.phone = customers.phone AND o.id != customers.id
+                AND (o.id < customers.id
+                     OR o.channel IS NOT '自动生成'
+                     OR EXISTS (SELECT 1 FROM message_logs m WHERE m.customer_id = o.id))
+          )
+        """
+    ).rowcount
+    duplicates = conn.execute(
+        """
+        SELECT phone, GROUP_CONCAT(id) AS ids FROM customers
+        WHERE phone IS NOT NULL AND phone != ''
+        GROUP BY phone HAVING COUNT(*) > 1
+        """
+    ).fetchall()
+    if duplicates:
+        details = "; ".join(f"{phone}: ids {ids}" for phone, ids in duplicates[:20])
+        more = f" (and {len(duplicates) - 20} more phones)" if len(duplicates) > 20 else ""
+        raise RuntimeError(
+            "customers contains duplicate phone numbers, so idx_customers_phone "
+            f"cannot be created; merge or correct these records first: {details}{more}"
+        )
+    if removed:
+        logger.warning(
+            "Removed %d duplicate generated customers without message logs "
+            "before creating idx_customers_phone",
+            removed,
+        )
+
+
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA mmap_size=268435456;
+"""
+
+# Number of prepared statements each connection keeps compiled.
+STATEMENT_CACHE_SIZE = 256
+
+
+class _Connection(sqlite3.Connection):
+    """``sqlite3.Connection`` that can be weakly referenced."""
+
+
+_tls = threading.local()
+# Weak so a connection is freed (and closed) together with the
+# ``threading.local`` of the thread that opened it; the set only lets
+# ``close_all`` reach the connections still alive at exit.
+_open_conns: "weakref.WeakSet[_Connection]" = weakref.WeakSet()
+_open_conns_lock = threading.Lock()
+
+
+def _conn() -> sqlite3.Connection:
+    """Return the calling thread's cached SQLite connection.
+
+    The connection is opened on first use in autocommit mode
+    (``isolation_level=None``) so single statements do not pay for an
+    implicit BEGIN/COMMIT, and is tuned with WAL journaling and a
+    larger page cache.  Rows are returned as ``sqlite3.Row`` objects.
+    """
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=_Connection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_PRAGMAS)
+        _tls.conn = conn
+        with _open_conns_lock:
+            _open_conns.add(conn)
+    return conn
+
+
+@atexit.register
+def close_all() -> None:
+    """Close every cached connection; registered to run at exit."""
+    with _open_conns_lock:
+        conns = list(_open_conns)
+        _open_conns.clear()
+    for conn in conns:
         conn.close()
 
 
 def execute(query: str, params: Iterable[Any] = ()) -> int:
     """Execute a write operation and return the last row id."""
-    with get_conn() as conn:
-        cur = conn.execute(query, params)
-        conn.commit()
-        return cur.lastrowid
+    cur = _conn().execute(query, params)
+    return cur.lastrowid
 
 
-def fetchall(query: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
-    with get_conn() as conn:
-        cur = conn.execute(query, params)
-        rows = [dict(row) for row in cur.fetchall()]
-    return rows
+def execute_rowcount(query: str, params: Iterable[Any] = ()) -> int:
+    """Execute a write operation and return the number of rows affected."""
+    cur = _conn().execute(query, params)
+    return cur.rowcount
+
+
+def executemany(query: str, seq_of_params: Iterable[Iterable[Any]]) -> int:
+    """Execute a write operation for every parameter set in one transaction.
+
+    Returns the number of rows affected.  The transaction is rolled back
+    if any of the statements, or the commit itself, fails.
+    """
+    conn = _conn()
+    conn.execute("BEGIN")
+    try:
+        cur = conn.executemany(query, seq_of_params)
+        conn.execute("COMMIT")
+    except BaseException:
+        # The connection lives as long as its thread, so it must never be
+        # left inside a transaction; SQLite may already have rolled back.
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return cur.rowcount
+
+
+def fetchall(query: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+    """Return every result row as a ``sqlite3.Row``.
+
+    Rows support ``row['col']`` access (and attribute-style access from
+    Jinja templates), so they are returned as-is rather than copied into
+    dictionaries.  Callers that need a real ``dict`` should convert the
+    row explicitly with ``dict(row)``.
+    """
+    cur = _conn().execute(query, params)
+    return cur.fetchall()
 
 
 def fetchone(query: str, params: Iterable[Any] = ()) -> Optional[Dict[str, Any]]:
-    with get_conn() as conn:
-        cur = conn.execute(query, params)
-        row = cur.fetchone()
-        return dict(row) if row else None
+    cur = _conn().execute(query, params)
+    row = cur.fetchone()
+    return dict(row) if row else None
@@ -9,16 +9,22 @@ should add authentication, HTTPS and other hardening measures.
 
 from __future__ import annotations
 
-import asyncio
 import datetime as dt
+import functools
+import itertools
+import os
+import sqlite3
+import time
 from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException, Request, Form
+import anyio.to_thread
+import jinja2
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from .database import init_db, fetchall, fetchone, execute
-from .utils import parse_command, generate_fake_customers, render_template_content
+from .database import init_db, fetchall, fetchone, execute, execute_rowcount, executemany
+from .utils import TEMPLATE_PLACEHOLDERS, parse_command, generate_fake_customers_columnar
 
 
 app = FastAPI(title="自动化营销平台", default_response_class=HTMLResponse)
@@ -35,22 +41,151 @@ BASE_DIR = Path(__file__).resolve().parent
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
 # Configure Jinja2 templates.  The templates directory lives alongside
-# this file.
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+# this file.  Templates are not checked for changes on every render and
+# their compiled bytecode is cached on disk under ``JINJA_CACHE_DIR``
+# (default ``.jinja_cache`` next to this file); set
+# ``TEMPLATE_AUTO_RELOAD=1`` while editing templates during development.
+JINJA_CACHE_DIR = Path(os.environ.get("JINJA_CACHE_DIR", BASE_DIR / ".jinja_cache"))
+
+
+def _jinja_bytecode_cache() -> Optional[jinja2.BytecodeCache]:
+    """Disk bytecode cache, or ``None`` if the cache directory is unusable.
+
+    A read-only deployment then simply compiles templates in memory
+    instead of failing to import.
+    """
+    try:
+        JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(JINJA_CACHE_DIR, os.W_OK):
+        return None
+    return jinja2.FileSystemBytecodeCache(str(JINJA_CACHE_DIR))
+
+
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(BASE_DIR / "templates")),
+        autoescape=True,
+        auto_reload=os.environ.get("TEMPLATE_AUTO_RELOAD") == "1",
+        bytecode_cache=_jinja_bytecode_cache(),
+    )
+)
+
+
+# -------------------- SQL Statements --------------------
+
+# Frequently executed statements are kept as module level constants so
+# every call hands the connection's statement cache the same string.
+
+INSERT_CUSTOMER_SQL = """
+INSERT INTO customers (name, phone, wechat, qq, company, position, industry, region, channel,
+                       collected_time, add_status, intention, remarks, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Customers are unique by phone number (see ``idx_customers_phone``);
+# generated customers whose phone already exists only refresh the
+# existing row's ``updated_at``.
+UPSERT_CUSTOMER_SQL = INSERT_CUSTOMER_SQL + """
+ON CONFLICT(phone) WHERE phone IS NOT NULL AND phone != ''
+DO UPDATE SET updated_at = excluded.updated_at
+"""
+
+UPDATE_CUSTOMER_SQL = """
+UPDATE customers
+SET name=?, phone=?, wechat=?, qq=?, company=?, position=?, industry=?, region=?, channel=?, add_status=?, intention=?, remarks=?, updated_at=?
+WHERE id=?
+"""
+
+INSERT_COMMAND_LOG_SQL = """
+INSERT INTO command_logs (command_content, status, time, created_at)
+VALUES (?, ?, ?, ?)
+"""
+
+UPDATE_COMMAND_LOG_SQL = """
+UPDATE command_logs
+SET standardized_command=?, result=?, error=?, status=?, duration=?
+WHERE id=?
+"""
+
+UPDATE_COMMAND_LOG_STATUS_SQL = """
+UPDATE command_logs SET status=? WHERE id=?
+"""
+
+
+# Each placeholder is swapped for a private-use character before the
+# template is bound, and SQL then replaces those characters.  Inserted
+# customer values are never rescanned, so a name containing "{公司}" stays
+# literal, matching ``render_template_content``'s single pass.  (The only
+# divergence: a template or value that itself contains one of these
+# private-use characters.)
+_SQL_PLACEHOLDER_MARKS = {
+    placeholder: chr(0xE000 + i) for i, placeholder in enumerate(TEMPLATE_PLACEHOLDERS)
+}
+
+
+def _render_sql() -> str:
+    """SQL expression filling the marked ``?`` template from a customer row."""
+    expr = "?"
+    for placeholder, column in TEMPLATE_PLACEHOLDERS.items():
+        mark = _SQL_PLACEHOLDER_MARKS[placeholder]
+        expr = f"REPLACE({expr}, '{mark}', COALESCE({column}, ''))"
+    return expr
+
+
+def _mark_placeholders(template_content: str) -> str:
+    """Prepare ``template_content`` for binding into ``SEND_MESSAGES_SQL``."""
+    for placeholder, mark in _SQL_PLACEHOLDER_MARKS.items():
+        template_content = template_content.replace(f"{{{placeholder}}}", mark)
+    return template_content
+
+
+# Group send: render the template for every added customer and log the
+# message in one statement.  Parameters are (send_time,
+# _mark_placeholders(template), created_at).
+SEND_MESSAGES_SQL = f"""
+INSERT INTO message_logs (customer_id, send_time, send_type, message_content, status, error, created_at)
+SELECT id, ?, '群发', {_render_sql()}, '发送成功', NULL, ?
+FROM customers WHERE add_status = '已添加'
+"""
+
+# Customer/friend/message totals shared by the report command and the
+# report page.
+SUMMARY_STATS_SQL = """
+SELECT (SELECT COUNT(*) FROM customers) AS total,
+       (SELECT COUNT(*) FROM customers WHERE add_status = '已添加') AS added,
+       (SELECT COUNT(*) FROM message_logs) AS messages
+"""
+
+
+# Route handlers are plain ``def`` functions because all database access
+# goes through the blocking ``sqlite3`` module; Starlette runs them in
+# its worker thread pool so concurrent requests do not stall the event
+# loop.  The default pool of 40 threads is raised to this many tokens.
+THREADPOOL_SIZE = 100
 
 
 @app.on_event("startup")
 async def startup() -> None:
-    """Initialise the database on application startup."""
+    """Initialise the database and size the worker thread pool."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
     init_db()
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
+def index(request: Request):
     """Render the dashboard with a high level overview of activity."""
-    total_customers = fetchone("SELECT COUNT(*) as cnt FROM customers")['cnt']
-    total_templates = fetchone("SELECT COUNT(*) as cnt FROM templates")['cnt']
-    total_messages = fetchone("SELECT COUNT(*) as cnt FROM message_logs")['cnt']
+    stats = fetchone(
+        """
+        SELECT (SELECT COUNT(*) FROM customers) AS customers,
+               (SELECT COUNT(*) FROM templates) AS templates,
+               (SELECT COUNT(*) FROM message_logs) AS messages
+        """
+    )
+    total_customers = stats['customers']
+    total_templates = stats['templates']
+    total_messages = stats['messages']
     last_command = fetchone("SELECT * FROM command_logs ORDER BY id DESC LIMIT 1")
     return templates.TemplateResponse(
         "index.html",
@@ -66,28 +201,69 @@ async def index(request: Request):
 
 # -------------------- Customer Management --------------------
 
+# The industry/region dropdowns on the customer list change rarely, so
+# they are cached for a short time.  Any write that can change the
+# industry/region values (add, edit, delete, gather) bumps
+# ``_customers_version`` which invalidates the cache immediately.
+FILTER_OPTIONS_TTL = 60.0
+_customers_version = 0
+_filter_options_cache: Dict[str, Any] = {"version": -1, "expires": 0.0, "value": ([], [])}
+
+
+def _invalidate_customer_cache() -> None:
+    global _customers_version
+    _customers_version += 1
+
+
+def _customer_filter_options() -> tuple[List[str], List[str]]:
+    """Return the distinct (industries, regions) used by the filter form."""
+    cache = _filter_options_cache
+    now = time.monotonic()
+    if cache["version"] == _customers_version and cache["expires"] > now:
+        return cache["value"]
+    version = _customers_version
+    rows = fetchall(
+        """
+        SELECT 'i' AS k, industry AS v FROM customers
+        WHERE industry IS NOT NULL AND industry != '' GROUP BY industry
+        UNION ALL
+        SELECT 'r', region FROM customers
+        WHERE region IS NOT NULL AND region != '' GROUP BY region
+        """
+    )
+    industries = [row['v'] for row in rows if row['k'] == 'i']
+    regions = [row['v'] for row in rows if row['k'] == 'r']
+    cache.update(version=version, expires=now + FILTER_OPTIONS_TTL, value=(industries, regions))
+    return industries, regions
+
+
+@functools.lru_cache(maxsize=None)
+def _list_customers_sql(columns: tuple[str, ...]) -> str:
+    """Build the customer list query filtering on ``columns``.
+
+    Each combination of filters maps to one canonical SQL string, so
+    the statement cache sees at most eight shapes.  Equality predicates
+    are used rather than ``? IS NULL OR col = ?`` so the planner can
+    still use the per-column indexes.
+    """
+    where = "".join(f" AND {column} = ?" for column in columns)
+    return f"SELECT * FROM customers WHERE 1=1{where} ORDER BY id DESC"
+
+
 @app.get("/customers", response_class=HTMLResponse)
-async def list_customers(
+def list_customers(
     request: Request,
     industry: Optional[str] = None,
     region: Optional[str] = None,
     add_status: Optional[str] = None,
 ):
     """List customers with optional filtering."""
-    base_query = "SELECT * FROM customers WHERE 1=1"
-    params: List[Any] = []
-    if industry:
-        base_query += " AND industry = ?"
-        params.append(industry)
-    if region:
-        base_query += " AND region = ?"
-        params.append(region)
-    if add_status:
-        base_query += " AND add_status = ?"
-        params.append(add_status)
-    customers = fetchall(base_query + " ORDER BY id DESC", params)
-    industries = [row['industry'] for row in fetchall("SELECT DISTINCT industry FROM customers WHERE industry IS NOT NULL") if row['industry']]
-    regions = [row['region'] for row in fetchall("SELECT DISTINCT region FROM customers WHERE region IS NOT NULL") if row['region']]
+    filters = {"industry": industry, "region": region, "add_status": add_status}
+    columns = tuple(column for column, value in filters.items() if value)
+    customers = fetchall(
+        _list_customers_sql(columns), [filters[column] for column in columns]
+    )
+    industries, regions = _customer_filter_options()
     return templates.TemplateResponse(
         "customers.html",
         {
@@ -103,12 +279,12 @@ async def list_customers(
 
 
 @app.get("/customers/add", response_class=HTMLResponse)
-async def add_customer_form(request: Request):
+def add_customer_form(request: Request):
     return templates.TemplateResponse("customer_form.html", {"request": request, "customer": None})
 
 
 @app.post("/customers/add")
-async def add_customer(
+def add_customer(
     request: Request,
     name: Optional[str] = Form(None),
     phone: Optional[str] = Form(None),
@@ -123,35 +299,35 @@ async def add_customer(
     remarks: Optional[str] = Form(None),
 ):
     now = dt.datetime.utcnow().isoformat()
-    execute(
-        """
-        INSERT INTO customers (name, phone, wechat, qq, company, position, industry, region, channel,
-                               collected_time, add_status, intention, remarks, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            name,
-            phone,
-            wechat,
-            qq,
-            company,
-            position,
-            industry,
-            region,
-            channel,
-            now,
-            "未添加",
-            intention,
-            remarks,
-            now,
-            now,
-        ),
-    )
+    try:
+        execute(
+            INSERT_CUSTOMER_SQL,
+            (
+                name,
+                phone,
+                wechat,
+                qq,
+                company,
+                position,
+                industry,
+                region,
+                channel,
+                now,
+                "未添加",
+                intention,
+                remarks,
+                now,
+                now,
+            ),
+        )
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="Phone number already exists")
+    _invalidate_customer_cache()
     return RedirectResponse(url="/customers", status_code=303)
 
 
 @app.get("/customers/edit/{customer_id}", response_class=HTMLResponse)
-async def edit_customer_form(customer_id: int, request: Request):
+def edit_customer_form(customer_id: int, request: Request):
     customer = fetchone("SELECT * FROM customers WHERE id = ?", (customer_id,))
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -161,7 +337,7 @@ async def edit_customer_form(customer_id: int, request: Request):
 
 
 @app.post("/customers/edit/{customer_id}")
-async def edit_customer(
+def edit_customer(
     customer_id: int,
     request: Request,
     name: Optional[str] = Form(None),
@@ -178,45 +354,45 @@ async def edit_customer(
     remarks: Optional[str] = Form(None),
 ):
     now = dt.datetime.utcnow().isoformat()
-    existing = fetchone("SELECT id FROM customers WHERE id = ?", (customer_id,))
-    if not existing:
+    try:
+        updated = execute_rowcount(
+            UPDATE_CUSTOMER_SQL,
+            (
+                name,
+                phone,
+                wechat,
+                qq,
+                company,
+                position,
+                industry,
+                region,
+                channel,
+                add_status,
+                intention,
+                remarks,
+                now,
+                customer_id,
+            ),
+        )
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="Phone number already exists")
+    if not updated:
         raise HTTPException(status_code=404, detail="Customer not found")
-    execute(
-        """
-        UPDATE customers
-        SET name=?, phone=?, wechat=?, qq=?, company=?, position=?, industry=?, region=?, channel=?, add_status=?, intention=?, remarks=?, updated_at=?
-        WHERE id=?
-        """,
-        (
-            name,
-            phone,
-            wechat,
-            qq,
-            company,
-            position,
-            industry,
-            region,
-            channel,
-            add_status,
-            intention,
-            remarks,
-            now,
-            customer_id,
-        ),
-    )
+    _invalidate_customer_cache()
     return RedirectResponse(url="/customers", status_code=303)
 
 
 @app.post("/customers/delete/{customer_id}")
-async def delete_customer(customer_id: int):
+def delete_customer(customer_id: int):
     execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+    _invalidate_customer_cache()
     return RedirectResponse(url="/customers", status_code=303)
 
 
 # -------------------- Template Management --------------------
 
 @app.get("/templates", response_class=HTMLResponse)
-async def list_templates(request: Request):
+def list_templates(request: Request):
     templates_list = fetchall("SELECT * FROM templates ORDER BY id DESC")
     return templates.TemplateResponse(
         "templates.html", {"request": request, "templates": templates_list}
@@ -224,14 +400,14 @@ async def list_templates(request: Request):
 
 
 @app.get("/templates/add", response_class=HTMLResponse)
-async def add_template_form(request: Request):
+def add_template_form(request: Request):
     return templates.TemplateResponse(
         "template_form.html", {"request": request, "template": None}
     )
 
 
 @app.post("/templates/add")
-async def add_template(
+def add_template(
     request: Request,
     name: str = Form(...),
     content: str = Form(...),
@@ -259,7 +435,7 @@ async def add_template(
 
 
 @app.get("/templates/edit/{template_id}", response_class=HTMLResponse)
-async def edit_template_form(template_id: int, request: Request):
+def edit_template_form(template_id: int, request: Request):
     template_obj = fetchone("SELECT * FROM templates WHERE id = ?", (template_id,))
     if not template_obj:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -270,7 +446,7 @@ async def edit_template_form(template_id: int, request: Request):
 
 
 @app.post("/templates/edit/{template_id}")
-async def edit_template(
+def edit_template(
     template_id: int,
     request: Request,
     name: str = Form(...),
@@ -280,10 +456,7 @@ async def edit_template(
     is_active: Optional[str] = Form("1"),
 ):
     now = dt.datetime.utcnow().isoformat()
-    existing = fetchone("SELECT id FROM templates WHERE id = ?", (template_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Template not found")
-    execute(
+    updated = execute_rowcount(
         """
         UPDATE templates
         SET name=?, content=?, type=?, scene=?, is_active=?, updated_at=?
@@ -299,77 +472,77 @@ async def edit_template(
             template_id,
         ),
     )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Template not found")
     return RedirectResponse(url="/templates", status_code=303)
 
 
 @app.post("/templates/delete/{template_id}")
-async def delete_template(template_id: int):
+def delete_template(template_id: int):
     execute("DELETE FROM templates WHERE id = ?", (template_id,))
     return RedirectResponse(url="/templates", status_code=303)
 
 
 # -------------------- Command Processing --------------------
 
-async def process_command(command_text: str) -> str:
+def process_command(command_text: str, parsed: Optional[Dict[str, Any]] = None) -> str:
     """Execute a parsed command and return a human‑readable result string.
 
     This function orchestrates the high level actions described in
-    ``utils.parse_command``.  It does not perform any network I/O and
-    therefore is safe to call within the request context.  More
-    sophisticated implementations could offload long running tasks to
-    background workers (e.g. Celery).
+    ``utils.parse_command``.  Callers that have already parsed the
+    command may pass the result as ``parsed`` to avoid parsing it
+    again.  It does not perform any network I/O.  Commands received over
+    HTTP are run from a FastAPI background task (see
+    ``run_command_and_update_log``); more sophisticated implementations
+    could hand long running tasks to dedicated workers (e.g. Celery).
     """
-    parsed = parse_command(command_text)
+    if parsed is None:
+        parsed = parse_command(command_text)
     action = parsed.get("action")
+    # All rows written by one command share a single timestamp.
+    now = dt.datetime.utcnow().isoformat()
     if action == "gather":
         industry = parsed.get("industry")
         number = parsed.get("number", 0)
-        new_customers = generate_fake_customers(industry, number)
-        now = dt.datetime.utcnow().isoformat()
-        for cust_data in new_customers:
-            execute(
-                """
-                INSERT INTO customers (name, phone, wechat, qq, company, position, industry, region, channel,
-                                       collected_time, add_status, intention, remarks, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    cust_data["name"],
-                    cust_data["phone"],
-                    cust_data["wechat"],
-                    cust_data["qq"],
-                    cust_data["company"],
-                    cust_data["position"],
-                    cust_data["industry"],
-                    cust_data["region"],
-                    cust_data["channel"],
-                    now,
-                    cust_data["add_status"],
-                    cust_data["intention"],
-                    cust_data["remarks"],
-                    now,
-                    now,
-                ),
-            )
-        return f"已生成{len(new_customers)}个{industry}行业客户信息。"
+        columns = generate_fake_customers_columnar(industry, number)
+        # Upserted rows that already existed only get their updated_at
+        # refreshed, so count the genuinely new rows by id afterwards.
+        last_id = fetchone("SELECT COALESCE(MAX(id), 0) AS id FROM customers")["id"]
+        executemany(
+            UPSERT_CUSTOMER_SQL,
+            zip(
+                columns["name"],
+                columns["phone"],
+                columns["wechat"],
+                columns["qq"],
+                columns["company"],
+                columns["position"],
+                columns["industry"],
+                columns["region"],
+                columns["channel"],
+                itertools.repeat(now),
+                columns["add_status"],
+                columns["intention"],
+                columns["remarks"],
+                itertools.repeat(now),
+                itertools.repeat(now),
+            ),
+        )
+        inserted = fetchone(
+            "SELECT COUNT(*) AS cnt FROM customers WHERE id > ? AND created_at = ?",
+            (last_id, now),
+        )["cnt"]
+        refreshed = len(columns["name"]) - inserted
+        _invalidate_customer_cache()
+        return f"已生成{len(columns['name'])}个{industry}行业客户信息，新增{inserted}个，更新{refreshed}个已有客户。"
     elif action == "add_friends":
         target = parsed.get("target")
-        # Fetch customers to be updated
         params: List[Any] = []
-        query = "SELECT id FROM customers WHERE add_status != '已添加'"
+        query = "UPDATE customers SET add_status='已添加' WHERE add_status != '已添加'"
         if target and target != "客户":
             query += " AND industry LIKE ?"
             params.append(f"%{target}%")
-        customers = fetchall(query, params)
-        count = len(customers)
-        if count:
-            if target and target != "客户":
-                execute(
-                    "UPDATE customers SET add_status='已添加' WHERE add_status != '已添加' AND industry LIKE ?",
-                    (f"%{target}%",),
-                )
-            else:
-                execute("UPDATE customers SET add_status='已添加' WHERE add_status != '已添加'")
+        count = execute_rowcount(query, params)
         return f"已将{count}位客户标记为已添加好友。"
     elif action == "send_messages":
         template_keyword = parsed.get("template_keyword")
@@ -385,41 +558,15 @@ async def process_command(command_text: str) -> str:
             )
         if not template:
             return "尚未配置任何话术模板，无法发送消息。"
-        customers = fetchall(
-            "SELECT id, name, industry, company FROM customers WHERE add_status = '已添加'"
+        sent_count = execute_rowcount(
+            SEND_MESSAGES_SQL, (now, _mark_placeholders(template["content"]), now)
         )
-        sent_count = 0
-        now = dt.datetime.utcnow().isoformat()
-        for customer in customers:
-            content = render_template_content(
-                template["content"],
-                {
-                    "name": customer["name"],
-                    "industry": customer["industry"],
-                    "company": customer["company"],
-                },
-            )
-            execute(
-                """
-                INSERT INTO message_logs (customer_id, send_time, send_type, message_content, status, error, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    customer["id"],
-                    now,
-                    "群发",
-                    content,
-                    "发送成功",
-                    None,
-                    now,
-                ),
-            )
-            sent_count += 1
         return f"消息发送完成，共发送给{sent_count}位客户。"
     elif action == "generate_report":
-        total = fetchone("SELECT COUNT(*) as cnt FROM customers")['cnt']
-        added = fetchone("SELECT COUNT(*) as cnt FROM customers WHERE add_status = '已添加'")['cnt']
-        msg_count = fetchone("SELECT COUNT(*) as cnt FROM message_logs")['cnt']
+        stats = fetchone(SUMMARY_STATS_SQL)
+        total = stats['total']
+        added = stats['added']
+        msg_count = stats['messages']
         return f"客户总数：{total}；已添加好友数：{added}；发送消息数：{msg_count}。"
     elif action in ("pause", "stop"):
         return "操作已暂停/终止（模拟）。"
@@ -428,33 +575,25 @@ async def process_command(command_text: str) -> str:
 
 
 @app.get("/commands", response_class=HTMLResponse)
-async def command_page(request: Request):
+def command_page(request: Request):
     logs = fetchall("SELECT * FROM command_logs ORDER BY id DESC LIMIT 20")
     return templates.TemplateResponse(
         "commands.html", {"request": request, "logs": logs}
     )
 
 
-@app.post("/commands")
-async def receive_command(request: Request, command: str = Form(...)):
-    # Record the command log
-    now = dt.datetime.utcnow().isoformat()
-    cmd_id = execute(
-        """
-        INSERT INTO command_logs (command_content, status, time, created_at)
-        VALUES (?, ?, ?, ?)
-        """,
-        (
-            command,
-            "执行中",
-            now,
-            now,
-        ),
-    )
+def run_command_and_update_log(cmd_id: int, command: str) -> None:
+    """Execute a queued command and record the outcome in its log row.
+
+    Runs as a background task after ``receive_command`` has responded,
+    so long gather/send batches do not hold the HTTP request open.
+    """
     start_time = dt.datetime.utcnow()
-    standardized = str(parse_command(command))
+    execute(UPDATE_COMMAND_LOG_STATUS_SQL, ("执行中", cmd_id))
+    parsed = parse_command(command)
+    standardized = str(parsed)
     try:
-        result = await process_command(command)
+        result = process_command(command, parsed=parsed)
         status = "执行成功"
         error = None
     except Exception as e:
@@ -465,11 +604,7 @@ async def receive_command(request: Request, command: str = Form(...)):
     duration = int((end_time - start_time).total_seconds())
     # Update the command log
     execute(
-        """
-        UPDATE command_logs
-        SET standardized_command=?, result=?, error=?, status=?, duration=?
-        WHERE id=?
-        """,
+        UPDATE_COMMAND_LOG_SQL,
         (
             standardized,
             result,
@@ -479,13 +614,33 @@ async def receive_command(request: Request, command: str = Form(...)):
             cmd_id,
         ),
     )
+
+
+@app.post("/commands")
+def receive_command(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    command: str = Form(...),
+):
+    # Record the command log and queue the command for execution
+    now = dt.datetime.utcnow().isoformat()
+    cmd_id = execute(
+        INSERT_COMMAND_LOG_SQL,
+        (
+            command,
+            "排队中",
+            now,
+            now,
+        ),
+    )
+    background_tasks.add_task(run_command_and_update_log, cmd_id, command)
     return RedirectResponse(url="/commands", status_code=303)
 
 
 # -------------------- Message and Command Logs --------------------
 
 @app.get("/messages", response_class=HTMLResponse)
-async def list_messages(request: Request):
+def list_messages(request: Request):
     messages = fetchall(
         "SELECT * FROM message_logs ORDER BY id DESC LIMIT 100"
     )
@@ -495,7 +650,7 @@ async def list_messages(request: Request):
 
 
 @app.get("/commandlogs", response_class=HTMLResponse)
-async def list_command_logs(request: Request):
+def list_command_logs(request: Request):
     logs = fetchall(
         "SELECT * FROM command_logs ORDER BY id DESC LIMIT 100"
     )
@@ -507,17 +662,19 @@ async def list_command_logs(request: Request):
 # -------------------- Data Report --------------------
 
 @app.get("/report", response_class=HTMLResponse)
-async def report_page(request: Request):
+def report_page(request: Request):
     # Compute summary statistics
-    total_customers = fetchone("SELECT COUNT(*) as cnt FROM customers")['cnt']
-    added_customers = fetchone("SELECT COUNT(*) as cnt FROM customers WHERE add_status = '已添加'")['cnt']
-    total_messages = fetchone("SELECT COUNT(*) as cnt FROM message_logs")['cnt']
-    industry_rows = fetchall("SELECT DISTINCT industry FROM customers WHERE industry IS NOT NULL")
-    industry_counts: List[tuple[str, int]] = []
-    for row in industry_rows:
-        ind = row['industry']
-        count = fetchone("SELECT COUNT(*) as cnt FROM customers WHERE industry = ?", (ind,))['cnt']
-        industry_counts.append((ind, count))
+    stats = fetchone(SUMMARY_STATS_SQL)
+    total_customers = stats['total']
+    added_customers = stats['added']
+    total_messages = stats['messages']
+    industry_counts: List[tuple[str, int]] = [
+        (row['industry'], row['cnt'])
+        for row in fetchall(
+            "SELECT industry, COUNT(*) as cnt FROM customers WHERE industry IS NOT NULL "
+            "GROUP BY industry ORDER BY cnt DESC"
+        )
+    ]
     return templates.TemplateResponse(
         "report.html",
         {
@@ -11,12 +11,71 @@ from __future__ import annotations
 
 import re
 import random
+import string
+import sys
 import datetime as dt
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from faker import Faker
+if TYPE_CHECKING:
+    from faker import Faker
 
-fake = Faker("zh_CN")
+# Command patterns recognised by ``parse_command``.  Quantifiers are
+# bounded so absurdly long industries/targets or digit runs are not fed
+# to ``int()`` or the database.  A command that has the unbounded
+# ``*_SHAPE_RE`` form but misses the bounds is rejected as "unknown"
+# rather than falling through to the add and keyword actions, which
+# would otherwise act on words inside the industry or target.
+# 搜集XX行业客户信息30条 or 搜集餐饮行业客户信息50条
+_GATHER_RE = re.compile(r"搜集(?P<industry>[\u4e00-\u9fa5\w]{1,32})行业?客户信息(?P<number>\d{1,6})条")
+_GATHER_SHAPE_RE = re.compile(r"搜集[\u4e00-\u9fa5\w]+行业?客户信息\d+条")
+# 添加XX行业客户微信 or 添加今日新增客户
+_ADD_RE = re.compile(r"添加(?P<target>[\u4e00-\u9fa5\w]{1,32})客户")
+_ADD_SHAPE_RE = re.compile(r"添加[\u4e00-\u9fa5\w]+客户")
+
+# Keywords driving the remaining actions.  Plain ``in`` tests over these
+# short tuples beat a combined regex scan for commands of this length.
+_SEND_KEYWORDS = ("群发", "发送")
+_TEMPLATE_KEYWORDS = ("欢迎", "产品", "跟进", "活动")
+_REPORT_KEYWORDS = ("简报", "报告")
+_STOP_KEYWORDS = ("停止", "终止")
+_PAUSE_KEYWORDS = ("暂停",)
+
+# Template placeholders and the customer fields they are filled from.
+# ``_PLACEHOLDER_RE`` is a single alternation built from this mapping,
+# so rendering stays one left-to-right pass over the template however
+# many placeholders are added here.
+TEMPLATE_PLACEHOLDERS = {
+    "客户姓名": "name",
+    "行业": "industry",
+    "公司": "company",
+}
+_PLACEHOLDER_RE = re.compile(
+    r"\{(%s)\}" % "|".join(map(re.escape, TEMPLATE_PLACEHOLDERS))
+)
+
+
+def _send_messages_fields(command: str) -> Dict[str, Any]:
+    # Determine template keyword: 欢迎话术, 产品介绍话术, 跟进话术, 活动通知话术
+    template_keyword = next((kw for kw in _TEMPLATE_KEYWORDS if kw in command), None)
+    return {
+        "action": "send_messages",
+        "template_keyword": template_keyword,
+        # Determine target from command if specified
+        "target": None,
+    }
+
+
+# Keyword-driven actions in priority order: the first entry whose
+# keywords occur in the command decides the action.
+_KEYWORD_ACTIONS: Tuple[Tuple[Tuple[str, ...], Callable[[str], Dict[str, Any]]], ...] = (
+    # Match send messages: 群发欢迎话术 to some target
+    (_SEND_KEYWORDS, _send_messages_fields),
+    # Match generate report: 简报/报告
+    (_REPORT_KEYWORDS, lambda command: {"action": "generate_report"}),
+    # Match stop or pause commands
+    (_STOP_KEYWORDS, lambda command: {"action": "stop"}),
+    (_PAUSE_KEYWORDS, lambda command: {"action": "pause"}),
+)
 
 
 def parse_command(text: str) -> Dict[str, Any]:
@@ -43,69 +102,163 @@ def parse_command(text: str) -> Dict[str, Any]:
     result: Dict[str, Any] = {"action": "unknown", "raw": command}
 
     # Match gather command: 搜集XX行业客户信息30条 or 搜集餐饮行业客户信息50条
-    m = re.search(r"搜集(?P<industry>[\u4e00-\u9fa5\w]+)行业?客户信息(?P<number>\d+)条", command)
-    if m:
-        result.update(
-            {
-                "action": "gather",
-                "industry": m.group("industry"),
-                "number": int(m.group("number")),
-            }
-        )
-        return result
+    # The literal anchors are checked with a plain substring test first so
+    # that most commands never enter the regex engine.
+    if "搜集" in command:
+        m = _GATHER_RE.search(command)
+        if m:
+            result.update(
+                {
+                    "action": "gather",
+                    "industry": m.group("industry"),
+                    "number": int(m.group("number")),
+                }
+            )
+            return result
+        if _GATHER_SHAPE_RE.search(command):
+            return result
 
     # Match add friends: 添加XX行业客户微信 or 添加今日新增客户
-    m = re.search(r"添加(?P<target>[\u4e00-\u9fa5\w]+)客户", command)
-    if m:
-        result.update(
-            {
-                "action": "add_friends",
-                "target": m.group("target"),
-            }
-        )
-        return result
+    if "添加" in command:
+        m = _ADD_RE.search(command)
+        if m:
+            result.update(
+                {
+                    "action": "add_friends",
+                    "target": m.group("target"),
+                }
+            )
+            return result
+        if _ADD_SHAPE_RE.search(command):
+            return result
 
-    # Match send messages: 群发欢迎话术 to some target
-    if "群发" in command or "发送" in command:
-        # Determine template keyword: 欢迎话术, 产品介绍话术, 跟进话术, 活动通知话术
-        template_keyword = None
-        for kw in ["欢迎", "产品", "跟进", "活动"]:
+    for keywords, fields in _KEYWORD_ACTIONS:
+        for kw in keywords:
             if kw in command:
-                template_keyword = kw
-                break
-        result.update(
-            {
-                "action": "send_messages",
-                "template_keyword": template_keyword,
-                # Determine target from command if specified
-                "target": None,
-            }
-        )
-        return result
+                result.update(fields(command))
+                return result
 
-    # Match generate report: 简报/报告
-    if "简报" in command or "报告" in command:
-        result.update({"action": "generate_report"})
-        return result
+    return result
 
-    # Match stop or pause commands
-    if "停止" in command or "终止" in command:
-        result.update({"action": "stop"})
-        return result
-    if "暂停" in command:
-        result.update({"action": "pause"})
-        return result
 
-    return result
+# Number of Faker-generated values kept per field for sampling.
+FAKE_POOL_SIZE = 4096
+# Number of customers sampled at a time by ``generate_fake_customers_iter``.
+FAKE_CHUNK_SIZE = 1024
+
+# Constant field values of generated customers, interned so that every
+# row references the same string object.
+_CHANNEL_GENERATED = sys.intern("自动生成")
+_ADD_STATUS_NOT_ADDED = sys.intern("未添加")
+_INTENTION_NONE = sys.intern("无")
+
+_WECHAT_FIRST = string.ascii_lowercase
+_WECHAT_CHARS = string.ascii_lowercase + string.digits + "_"
+
+# Values that need no locale data (QQ numbers, WeChat IDs, phone number
+# suffixes, pool sampling) come straight from this generator.
+_rng = random.Random()
+
+# Lazily created Faker instance and the value pools sampled from it; see
+# ``_get_faker`` and ``_get_fake_pools``.
+_fake: Optional["Faker"] = None
+_fake_pools: Optional[Dict[str, List[str]]] = None
+
+
+def _get_faker() -> "Faker":
+    """Return the shared ``zh_CN`` Faker instance, creating it on first use.
+
+    Constructing Faker loads the locale's provider data, so it is
+    deferred until customers are actually generated; importing this
+    module for command parsing or template rendering stays cheap.
+    """
+    global _fake
+    if _fake is None:
+        from faker import Faker
+
+        _fake = Faker("zh_CN")
+    return _fake
+
+
+def _random_wechat() -> str:
+    """Return a random WeChat-style ID: a letter then 5-11 ``[a-z0-9_]``."""
+    return _rng.choice(_WECHAT_FIRST) + "".join(
+        _rng.choices(_WECHAT_CHARS, k=_rng.randint(5, 11))
+    )
+
+
+def _get_fake_pools() -> Dict[str, List[str]]:
+    """Return pools of Faker-generated values, building them on first use.
+
+    Faker dispatches through its provider chain on every call, which
+    dominates the cost of generating customers.  Instead each field is
+    generated ``FAKE_POOL_SIZE`` times once and then sampled.  Phone
+    numbers only pool their three digit prefixes so that generated
+    numbers stay effectively unique.
+    """
+    global _fake_pools
+    if _fake_pools is None:
+        fake = _get_faker()
+        _fake_pools = {
+            "name": [fake.name() for _ in range(FAKE_POOL_SIZE)],
+            "phone_prefix": sorted({fake.phone_number()[:3] for _ in range(FAKE_POOL_SIZE)}),
+            "company": [fake.company() for _ in range(FAKE_POOL_SIZE)],
+            "position": [fake.job() for _ in range(FAKE_POOL_SIZE)],
+            "region": [fake.province() for _ in range(FAKE_POOL_SIZE)],
+        }
+    return _fake_pools
+
+
+def _batch_fields(industry: str) -> Dict[str, Any]:
+    """Fields shared by every fake customer generated in one batch."""
+    return {
+        "industry": industry,
+        "channel": _CHANNEL_GENERATED,
+        "collected_time": dt.datetime.utcnow(),
+        "add_status": _ADD_STATUS_NOT_ADDED,
+        "intention": _INTENTION_NONE,
+        "remarks": None,
+    }
+
+
+def _sample_customer_columns(number: int) -> Dict[str, List[Any]]:
+    """Sample the per-customer fields of ``number`` customers column-wise."""
+    pools = _get_fake_pools()
+    return {
+        "name": _rng.choices(pools["name"], k=number),
+        "phone": [
+            f"{prefix}{_rng.randrange(10**8):08d}"
+            for prefix in _rng.choices(pools["phone_prefix"], k=number)
+        ],
+        "wechat": [_random_wechat() for _ in range(number)],
+        "qq": [str(_rng.randrange(10**8, 10**9)) for _ in range(number)],
+        "company": _rng.choices(pools["company"], k=number),
+        "position": _rng.choices(pools["position"], k=number),
+        "region": _rng.choices(pools["region"], k=number),
+    }
+
+
+def _columns_to_rows(
+    columns: Dict[str, List[Any]], base: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Turn a column mapping into one dict per row, starting from ``base``."""
+    keys = tuple(columns)
+    rows: List[Dict[str, Any]] = []
+    for values in zip(*columns.values()):
+        row = dict(base) if base else {}
+        row.update(zip(keys, values))
+        rows.append(row)
+    return rows
 
 
 def generate_fake_customers(industry: str, number: int) -> List[Dict[str, Any]]:
     """Generate a list of fake customer dictionaries.
 
-    This helper uses the Faker library to fabricate plausible Chinese
-    names, phone numbers and company names.  The resulting records
-    mirror the schema expected by the Customer model.  A timestamp
-    indicating when the customers were "collected" is attached.
+    This helper samples pools of Faker-generated Chinese names, phone
+    number prefixes and company names to fabricate plausible records.
+    The resulting records mirror the schema expected by the Customer
+    model.  A timestamp indicating when the customers were "collected"
+    is attached; all customers of one batch share it.
 
     Parameters
     ----------
@@ -120,49 +273,48 @@ def generate_fake_customers(industry: str, number: int) -> List[Dict[str, Any]]:
         A list of customer dictionaries ready for insertion into the
         database.
     """
-    customers: List[Dict[str, Any]] = []
-    for _ in range(number):
-        name = fake.name()
-        phone = fake.phone_number()
-        wechat = fake.user_name()
-        qq = str(fake.random_number(digits=9))
-        company = fake.company()
-        position = fake.job()
-        region = fake.province()
-        collected_time = dt.datetime.utcnow()
-        customers.append(
-            {
-                "name": name,
-                "phone": phone,
-                "wechat": wechat,
-                "qq": qq,
-                "company": company,
-                "position": position,
-                "industry": industry,
-                "region": region,
-                "channel": "自动生成",
-                "collected_time": collected_time,
-                "add_status": "未添加",
-                "intention": "无",
-                "remarks": None,
-            }
-        )
-    return customers
+    return list(generate_fake_customers_iter(industry, number))
+
+
+def generate_fake_customers_iter(industry: str, number: int) -> Iterator[Dict[str, Any]]:
+    """Yield fake customer dictionaries one at a time.
+
+    Produces the same records as :func:`generate_fake_customers` but
+    samples them ``FAKE_CHUNK_SIZE`` at a time, so a consumer inserting
+    rows as they arrive never holds more than one chunk in memory.
+    """
+    base = _batch_fields(industry)
+    for offset in range(0, number, FAKE_CHUNK_SIZE):
+        size = min(FAKE_CHUNK_SIZE, number - offset)
+        yield from _columns_to_rows(_sample_customer_columns(size), base)
+
+
+def generate_fake_customers_columnar(industry: str, number: int) -> Dict[str, List[Any]]:
+    """Generate fake customers as columns rather than rows.
+
+    Returns the same fields as :func:`generate_fake_customers`, but as
+    a mapping from field name to a list of ``number`` values.  This
+    suits consumers that are column-aware themselves, such as
+    ``executemany`` fed with ``zip(*columns)``, and avoids building a
+    dictionary per customer.
+    """
+    columns = _sample_customer_columns(number)
+    for key, value in _batch_fields(industry).items():
+        columns[key] = [value] * number
+    return columns
 
 
 def render_template_content(template_content: str, customer: Dict[str, Any]) -> str:
     """Replace placeholders in a template with customer data.
 
     Supported placeholders include ``{客户姓名}``, ``{行业}``, ``{公司}``.
-    Additional keys may be added as needed.  If a placeholder is
-    missing from the customer record it's replaced by an empty string.
+    Additional keys may be added to ``TEMPLATE_PLACEHOLDERS``.  If a
+    placeholder is missing from the customer record it's replaced by an
+    empty string.
     """
-    content = template_content
-    placeholders = {
-        "客户姓名": customer.get("name") or "",
-        "行业": customer.get("industry") or "",
-        "公司": customer.get("company") or "",
-    }
-    for key, value in placeholders.items():
-        content = content.replace(f"{{{key}}}", value)
-    return content
+    if "{" not in template_content:
+        return template_content
+    return _PLACEHOLDER_RE.sub(
+        lambda m: customer.get(TEMPLATE_PLACEHOLDERS[m.group(1)]) or "",
+        template_content,
+    )